@@ -32,11 +32,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Tuple, Any
 import math
-import heapq
+import asyncio
+import contextlib
+import functools
 import random
 import time
 import logging
 import threading
+from collections import defaultdict, deque
+from itertools import islice
+
+from fast_geo import EARTH_R, DEG2RAD, haversine, CsrGraph, to_csr, shortest_path_csr
 
 # === REAL INDIAN TRAINS ===
 REAL_TRAINS = [
@@ -68,7 +74,17 @@ except Exception:
             }
         }
 
-app = FastAPI(title="KAVACH 2.0 — Indian Railways AI")
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.spawn_task = asyncio.create_task(spawn_worker())
+    try:
+        yield
+    finally:
+        app.state.spawn_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await app.state.spawn_task
+
+app = FastAPI(title="KAVACH 2.0 — Indian Railways AI", lifespan=lifespan)
 >>>>>>> 42b56fc74ed4d9318fd8a98b55c9f9214c9b0ffd
 
 app.add_middleware(
@@ -271,22 +287,45 @@ if __name__ == "__main__":
 start_time = time.time()
 trains_saved_today = 0
 current_graph = {"stations": {}, "edges": []}
+_graph_version = 0  # bumped by /decide whenever the graph actually changes
+_graph_lock = threading.Lock()  # /decide runs in the threadpool: version and graph move together
 current_trains: List[Dict[str, Any]] = []
 train_risk_cache: Dict[str, Dict[str, Optional[float]]] = {}
 
 # === Logging System ===
-logs_buffer = []
 MAX_LOGS = 2000
+logs_buffer: deque = deque(maxlen=MAX_LOGS)
+# Views of logs_buffer keyed by (level, None), (None, train_id) and (level, train_id),
+# so every /logs filter combination is a tail read of one deque
+_logs_index: Dict[Tuple[Optional[str], Optional[str]], deque] = {}
+_logs_lock = threading.Lock()  # the spawn thread logs while requests read
+
+def _log_keys(entry):
+    level, train_id = entry["level"], entry["train_id"]
+    if train_id:
+        return ((level, None), (None, train_id), (level, train_id))
+    return ((level, None),)
+
 def push_log(level: str, message: str, train_id: Optional[str] = None):
-    logs_buffer.append({"ts": time.time(), "level": level.upper(), "msg": message, "train_id": train_id})
-    if len(logs_buffer) > MAX_LOGS:
-        logs_buffer.pop(0)
+    entry = {"ts": time.time(), "level": level.upper(), "msg": message, "train_id": train_id}
+    with _logs_lock:
+        if len(logs_buffer) == MAX_LOGS:
+            # the bounded append below evicts logs_buffer[0]; it is also the oldest entry of each of its views
+            for key in _log_keys(logs_buffer[0]):
+                q = _logs_index[key]
+                q.popleft()
+                if not q: del _logs_index[key]
+        logs_buffer.append(entry)
+        for key in _log_keys(entry):
+            _logs_index.setdefault(key, deque()).append(entry)
 
 # === Spawn Engine ===
 spawn_enabled = False
 spawn_interval = 10  # seconds
 max_trains = 100
 spawned_trains: List[Dict[str, Any]] = []
+_spawn_lock = threading.Lock()  # /spawn/* handlers run in the threadpool, the spawner on the event loop
+_rng = random.Random()  # private stream for spawn/stress generation, off the shared module-level generator
 
 # === Models ===
 class TrainModel(BaseModel):
@@ -310,54 +349,133 @@ class InputModel(BaseModel):
     graph: GraphModel
 
 # === Utils ===
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000
-    φ1, φ2 = math.radians(lat1), math.radians(lat2)
-    Δφ = math.radians(lat2 - lat1)
-    Δλ = math.radians(lon2 - lon1)
-    a = math.sin(Δφ/2)**2 + math.cos(φ1) * math.cos(φ2) * math.sin(Δλ/2)**2
-    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+@functools.lru_cache(maxsize=4096)
+def _hav(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """haversine memoised on the coordinates themselves, so a graph swap never needs a clear."""
+    return haversine(lat1, lon1, lat2, lon2)
 
-def dijkstra(stations, edges: List[Tuple[str, str]], start, goal, blocked=None, environment=None):
-    if blocked is None: blocked = set()
+RADIX_MIN_NODES = 100  # below this, heapq's constants beat the radix heap
+
+def build_adjacency(stations, edges: List[Tuple[str, str]], environment=None, blocked=None):
+    blocked = {frozenset(e) for e in blocked} if blocked else None  # canonical: one lookup covers both directions
     adj = {s: [] for s in stations}
+    # Segment ids are 'u-v-i': group p100 by their 'u-v' prefix in one pass (O(S+E), not O(E*S))
+    seg_risk = defaultdict(list)
+    if environment and "segments" in environment:
+        for seg_id, seg_data in environment["segments"].items():
+            seg_risk[seg_id.rsplit("-", 1)[0]].append(seg_data.get("p100", 0.0))
     for u, v in edges:
-        if (u,v) in blocked or (v,u) in blocked: continue
-        d = haversine(stations[u]["lat"], stations[u]["lon"], stations[v]["lat"], stations[v]["lon"])
+        if blocked and frozenset((u, v)) in blocked: continue
+        a, b = stations[u], stations[v]
+        d = _hav(a["lat"], a["lon"], b["lat"], b["lon"])
         # Incorporate segment risk from P91-P100 if environment available
         risk_factor = 0.0
-        if environment and "segments" in environment:
-            seg_prefix = f"{u}-{v}-"
-            seg_risks = [seg_data.get("p100", 0.0) for seg_id, seg_data in environment["segments"].items() if seg_id.startswith(seg_prefix)]
-            if seg_risks:
-                risk_factor = sum(seg_risks) / len(seg_risks)  # average p100
+        seg_risks = seg_risk.get(f"{u}-{v}")
+        if seg_risks:
+            risk_factor = sum(seg_risks) / len(seg_risks)  # average p100
         # Weight = haversine distance * (1 + risk_factor)
         weight = d * (1 + risk_factor)
+        weight = round(weight)  # whole meters at every size, so heapq and the radix heap see the same ties
         adj[u].append((v, weight))
         adj[v].append((u, weight))
-    if start not in adj or goal not in adj: return None
-    pq = [(0, start, [start])]
-    visited = set()
-    while pq:
-        dist, node, path = heapq.heappop(pq)
-        if node in visited: continue
-        if node == goal: return path
-        visited.add(node)
-        for nxt, w in adj[node]:
-            if nxt not in visited:
-                heapq.heappush(pq, (dist + w, nxt, path + [nxt]))
-    return None
+    return adj
+
+_csr_cache: Tuple[Any, Optional[CsrGraph]] = (None, None)
+
+def cached_csr(version: int, stations, edges: List[Tuple[str, str]], environment=None) -> CsrGraph:
+    """Unblocked CSR adjacency of the graph that was current at `version`, rebuilt only when it moves.
+    The segment environment is derived from stations + edges, so the version is the key."""
+    global _csr_cache
+    key = (version, bool(environment and environment.get("segments")))
+    if _csr_cache[0] != key:
+        _csr_cache = (key, to_csr(build_adjacency(stations, edges, environment)))
+    return _csr_cache[1]
+
+def dijkstra_with_block(g: CsrGraph, start, goal, blocked_edge: Optional[Tuple[str, str]] = None):
+    """Shortest path over a prebuilt CSR graph, skipping `blocked_edge` in either direction."""
+    index = g.index
+    if start not in index or goal not in index: return None
+    blocked = (index.get(blocked_edge[0], -1), index.get(blocked_edge[1], -1)) if blocked_edge else (-1, -1)
+    path = shortest_path_csr(g, index[start], index[goal], blocked, radix=len(g.names) >= RADIX_MIN_NODES)
+    return None if path is None else [g.names[k] for k in path]
+
+def dijkstra(stations, edges: List[Tuple[str, str]], start, goal, blocked=None, environment=None):
+    return dijkstra_with_block(to_csr(build_adjacency(stations, edges, environment, blocked)), start, goal)
+
+# === Collision Scan ===
+PAIR_SCAN_CHUNKS = 4  # contiguous row-chunks of the upper triangle
+MIN_TTC = 0.1  # TTC floor; a pair at the floor carries the highest risk any pair can reach
+
+def _future_position(T, stations, lookahead):
+    # Simulate future position using path + progress
+    path = T.path
+    segs = len(path) - 1
+    prog = (T.progress + (T.speed / 3600) * lookahead / 100) % 1
+    idx = min(int(prog * segs), segs - 1)
+    frac = prog * segs - idx
+    P1 = stations.get(path[idx], {"lat": 20, "lon": 70})
+    P2 = stations.get(path[idx + 1], {"lat": 20, "lon": 70})
+    return P1["lat"] + (P2["lat"] - P1["lat"]) * frac, P1["lon"] + (P2["lon"] - P1["lon"]) * frac
+
+def _fleet_arrays(trains, stations, lookahead):
+    """Flat per-train arrays for the pair kernel, so the O(N^2) loop does no trig and no lookups:
+    future lat/lon as arc lengths in meters (radians * EARTH_R), cos/sin of half the latitude, and speed in m/s."""
+    y, x, ch, sh, v = [], [], [], [], []
+    cos, sin = math.cos, math.sin
+    for T in trains:
+        la, lo = _future_position(T, stations, lookahead)
+        la *= DEG2RAD
+        y.append(la * EARTH_R)
+        x.append(lo * DEG2RAD * EARTH_R)
+        ch.append(cos(la * 0.5))
+        sh.append(sin(la * 0.5))
+        v.append(T.speed * 1000 / 3600)
+    return y, x, ch, sh, v
+
+def _scan_rows(fleet, rows, meta_risk, cut=float('inf')):
+    """Best (i, j, risk, ttc) over pairs whose first train index lies in `rows`.
+    `cut` is the clamped TTC of a best pair found elsewhere; pairs that cannot beat it are not evaluated.
+    Distance is the equirectangular approximation (ample for the short separations that drive TTC),
+    with cos(mean lat) expanded as cos(a/2)cos(b/2) - sin(a/2)sin(b/2) from per-train terms."""
+    y, x, ch, sh, v = fleet
+    best = (-1, -1, 0.0, float('inf'))
+    # Risk only falls as TTC grows (flat past 60 s), so a pair whose TTC reaches the best pair's
+    # clamped TTC cannot beat it. |dy| never exceeds the distance, so it bounds TTC before any sqrt,
+    # and risk itself is only computed for pairs that pass both checks.
+    base = 0.5 * meta_risk
+    sqrt = math.sqrt
+    n = len(y)
+    for i in rows:
+        yA, xA, chA, shA, vA = y[i], x[i], ch[i], sh[i], v[i]
+        for j in range(i+1, n):
+            dy = y[j] - yA
+            rel = abs(vA - v[j]) + 1
+            if abs(dy) / rel >= cut: continue
+            dx = (x[j] - xA) * (chA * ch[j] - shA * sh[j])
+            ttc = sqrt(dx*dx + dy*dy) / rel
+            if ttc >= cut: continue
+            if ttc < MIN_TTC: ttc = MIN_TTC
+            risk = base + 0.5 * (1 - min(ttc/60, 1))
+            if risk > best[2]:
+                best = (i, j, risk, ttc)
+                cut = min(ttc, 60.0)
+                if cut <= MIN_TTC: return best  # nothing can score strictly higher
+    return best
 
 # === MAIN AI ENGINE ===
 @app.post("/decide")
 def decide(data: InputModel):
-    global current_graph, current_trains, train_risk_cache, trains_saved_today
+    global current_graph, _graph_version, current_trains, train_risk_cache, trains_saved_today
 
     stations = {k: {"lat": v["lat"], "lon": v["lon"]} for k, v in data.graph.stations.items()}
     edges: List[Tuple[str, str]] = [(e[0], e[1]) for e in data.graph.edges]
-    trains = [t.dict() for t in data.trains]
+    trains = [t.model_dump() for t in data.trains]  # one dump per train, for the param engine and current_trains
 
-    current_graph = {"stations": stations, "edges": edges}
+    with _graph_lock:
+        if stations != current_graph["stations"] or edges != current_graph["edges"]:
+            _graph_version += 1
+        current_graph = {"stations": stations, "edges": edges}
+        version = _graph_version  # this request's graph; another /decide may move the global meanwhile
     current_trains = trains
 
     result = compute140Parameters(trains, stations, edges)
@@ -366,64 +484,49 @@ def decide(data: InputModel):
     LOOKAHEAD = 50
     CRITICAL_TTC = 18
     highest_risk = 0.0
-    collision_pair = None
+    best_i = best_j = -1  # winning pair as indices into data.trains
     critical_ttc = float('inf')
 
-    for i in range(len(trains)):
-        for j in range(i+1, len(trains)):
-            A, B = trains[i], trains[j]
-            # Simulate future positions using path + progress
-            segsA = len(A["path"]) - 1
-            segsB = len(B["path"]) - 1
-            progA = (A["progress"] + (A["speed"] / 3600) * LOOKAHEAD / 100) % 1
-            progB = (B["progress"] + (B["speed"] / 3600) * LOOKAHEAD / 100) % 1
-            idxA = min(int(progA * segsA), segsA - 1)
-            idxB = min(int(progB * segsB), segsB - 1)
-            fracA = progA * segsA - idxA
-            fracB = progB * segsB - idxB
-
-            uA, vA = A["path"][idxA], A["path"][idxA + 1]
-            uB, vB = B["path"][idxB], B["path"][idxB + 1]
-            A1 = stations.get(uA, {"lat": 20, "lon": 70})
-            A2 = stations.get(vA, {"lat": 20, "lon": 70})
-            B1 = stations.get(uB, {"lat": 20, "lon": 70})
-            B2 = stations.get(vB, {"lat": 20, "lon": 70})
-
-            future_latA = A1["lat"] + (A2["lat"] - A1["lat"]) * fracA
-            future_lonA = A1["lon"] + (A2["lon"] - A1["lon"]) * fracA
-            future_latB = B1["lat"] + (B2["lat"] - B1["lat"]) * fracB
-            future_lonB = B1["lon"] + (B2["lon"] - B1["lon"]) * fracB
-
-            dist = haversine(future_latA, future_lonA, future_latB, future_lonB)
-            rel_speed = abs(A["speed"] - B["speed"]) * 1000 / 3600 + 1
-            ttc = max(0.1, dist / rel_speed)
-
-            risk = 0.5 * result["params"].get("meta_risk_index", 0.5) + 0.5 * (1 - min(ttc/60, 1))
-
+    # The hot path reads the pydantic models directly; `trains` dicts only feed the param engine
+    models = data.trains
+    meta_risk = result["params"].get("meta_risk_index", 0.5)
+    n = len(models)
+    if n == 2:
+        # One pair: a single kernel call, no chunking or bound bookkeeping
+        i, j, risk, ttc = _scan_rows(_fleet_arrays(models, stations, LOOKAHEAD), (0,), meta_risk)
+        if risk > highest_risk:
+            highest_risk, best_i, best_j, critical_ttc = risk, i, j, ttc
+    elif n > 2:
+        step = max(1, math.ceil(n / PAIR_SCAN_CHUNKS))
+        fleet = _fleet_arrays(models, stations, LOOKAHEAD)
+        # Branch and bound: each chunk starts from the running best, so rows after a close pair mostly skip
+        cut = float('inf')
+        for lo in range(0, n, step):
+            if cut <= MIN_TTC: break
+            i, j, risk, ttc = _scan_rows(fleet, range(lo, min(lo + step, n)), meta_risk, cut)
             if risk > highest_risk:
-                highest_risk = risk
-                collision_pair = (A, B)
-                critical_ttc = ttc
-
-    # Update risk cache
-    for t in trains:
-        train_risk_cache[t["id"]] = {
-            "ttc": round(critical_ttc, 2) if critical_ttc < 120 else None,
-            "riskLevel": round(min(1.0, highest_risk * 1.4), 4)
-        }
+                highest_risk, best_i, best_j, critical_ttc = risk, i, j, ttc
+                cut = min(ttc, 60.0)
+    # n < 2: no pairs, so the NORMAL response and an empty-risk cache entry follow directly
+
+    # Update risk cache — the rounded entry is the same for every train, so share one dict
+    risk_entry = {
+        "ttc": round(critical_ttc, 2) if critical_ttc < 120 else None,
+        "riskLevel": round(min(1.0, highest_risk * 1.4), 4)
+    }
+    train_risk_cache.update(dict.fromkeys((t.id for t in models), risk_entry))
 
-    if collision_pair and critical_ttc < CRITICAL_TTC:
-        A, B = collision_pair
-        low = A if A["priority"] <= B.get("priority", 1) else B
+    if best_i >= 0 and critical_ttc < CRITICAL_TTC:
+        low = models[best_i if models[best_i].priority <= models[best_j].priority else best_j]
         trains_saved_today += 1
 
-        blocked = {(low["path"][0], low["path"][1])}
-        alt_path = dijkstra(stations, edges, low["path"][0], low["destination"], blocked, env)
+        g = cached_csr(version, stations, edges, env)
+        alt_path = dijkstra_with_block(g, low.path[0], low.destination, (low.path[0], low.path[1]))
 
         return {
             "action": "EMERGENCY_STOP" if not alt_path else "REQUEST_CONFIRMATION",
-            "train_id": low["id"],
-            "train_name": low["name"],
+            "train_id": low.id,
+            "train_name": low.name,
             "suggested_path": alt_path or [],
             "reason": f"AI Prevented Collision • TTC {critical_ttc:.1f}s",
             "kavach_saved": "YES" if critical_ttc < 8 else "NO",
@@ -460,108 +563,100 @@ def parameters_full():
         "stats": {"trains_saved_today": trains_saved_today}
     }
 
-# === STRESS TEST 50 — SMOOTH ANIMATION READY ===
-@app.get("/stress_test_50")
-def stress_test_50():
+# === STRESS TESTS ===
+STRESS_FALLBACK_STATIONS = ["NDLS", "AGC", "GAYA", "HWH", "MAS", "SBC", "LKO", "JP", "ADI", "PUNE"]
+
+def _neighbors_of(edges) -> Dict[str, List[str]]:
+    # forward neighbours first, then reverse ones, matching the old per-step edge scans
+    nb: Dict[str, List[str]] = {}
+    for e in edges:
+        nb.setdefault(e[0], []).append(e[1])
+    for e in edges:
+        nb.setdefault(e[1], []).append(e[0])
+    return nb
+
+_neighbors_cache: Tuple[int, Dict[str, List[str]]] = (-1, {})
+def graph_neighbors() -> Dict[str, List[str]]:
+    """Neighbour map of current_graph, rebuilt only when _graph_version moves."""
+    global _neighbors_cache
+    with _graph_lock:
+        version, edges = _graph_version, current_graph["edges"]
+    cached_version, nb = _neighbors_cache
+    if cached_version != version:
+        nb = _neighbors_of(edges)
+        _neighbors_cache = (version, nb)
+    return nb
+
+def _stress(n: int, prefix: str, chaos: bool):
     stations_list = list(current_graph["stations"].keys())
     if len(stations_list) < 4:
-        stations_list = ["NDLS", "AGC", "GAYA", "HWH", "MAS", "SBC", "LKO", "JP", "ADI", "PUNE"]
+        stations_list = STRESS_FALLBACK_STATIONS
+    neighbors_of = graph_neighbors()
+    m = len(stations_list)
 
     trains = []
-    for i in range(50):
-        source = random.choice(stations_list)
-        dest = random.choice([s for s in stations_list if s != source])
+    for i in range(n):
+        si = _rng.randrange(m)
+        di = _rng.randrange(m - 1)
+        if di >= si: di += 1  # any station but the source, without a filtered copy of the list
+        source, dest = stations_list[si], stations_list[di]
         path = [source]
         current = source
-        steps = random.randint(3, 8)
+        steps = _rng.randint(3, 8)
         for _ in range(steps):
-            neighbors = [e[1] for e in current_graph["edges"] if e[0] == current] + \
-                        [e[0] for e in current_graph["edges"] if e[1] == current]
-            if not neighbors: break
-            next_stop = random.choice([n for n in neighbors if n not in path[-2:]])
-            path.append(next_stop)
-            current = next_stop
+            options = [x for x in neighbors_of.get(current, ()) if x not in path[-2:]]
+            if not options: break
+            current = _rng.choice(options)
+            path.append(current)
         path.append(dest)
 
-        train_info = random.choice(REAL_TRAINS)
+        train_info = _rng.choice(REAL_TRAINS)
+        speed = _rng.uniform(80, 160)
+        if chaos and _rng.random() < 0.3:  # 30% chaos
+            speed += _rng.uniform(-30, 30)
         trains.append({
-            "id": f"T{i+1:03d}",
+            "id": f"{prefix}{i+1:03d}",
             "name": train_info["name"],
             "train_type": train_info["type"],
             "source": source,
             "destination": dest,
             "path": path,
-            "progress": random.uniform(0.05, 0.8),
-            "speed": random.uniform(80, 160),
-            "priority": random.randint(1, 3),
+            "progress": _rng.uniform(0.05, 0.8),
+            "speed": speed,
+            "priority": _rng.randint(1, 3),
             "status": "MOVING"
         })
     return {"trains": trains}
 
+# === STRESS TEST 50 — SMOOTH ANIMATION READY ===
+@app.get("/stress_test_50")
+def stress_test_50():
+    return _stress(50, "T", chaos=False)
+
 # === STRESS TEST 100 — CHAOS SIMULATOR ===
 @app.get("/stress_test_100")
 def stress_test_100():
-    stations_list = list(current_graph["stations"].keys())
-    if len(stations_list) < 4:
-        stations_list = ["NDLS", "AGC", "GAYA", "HWH", "MAS", "SBC", "LKO", "JP", "ADI", "PUNE"]
-
-    trains = []
-    for i in range(100):
-        source = random.choice(stations_list)
-        dest = random.choice([s for s in stations_list if s != source])
-        path = [source]
-        current = source
-        steps = random.randint(3, 8)
-        for _ in range(steps):
-            neighbors = [e[1] for e in current_graph["edges"] if e[0] == current] + \
-                        [e[0] for e in current_graph["edges"] if e[1] == current]
-            if not neighbors: break
-            next_stop = random.choice([n for n in neighbors if n not in path[-2:]])
-            path.append(next_stop)
-            current = next_stop
-        path.append(dest)
-
-        train_info = random.choice(REAL_TRAINS)
-        speed = random.uniform(80, 160)
-        if random.random() < 0.3:  # 30% chaos
-            speed += random.uniform(-30, 30)
-        trains.append({
-            "id": f"C{i+1:03d}",
-            "name": train_info["name"],
-            "train_type": train_info["type"],
-            "source": source,
-            "destination": dest,
-            "path": path,
-            "progress": random.uniform(0.05, 0.8),
-            "speed": speed,
-            "priority": random.randint(1, 3),
-            "status": "MOVING"
-        })
-    return {"trains": trains}
+    return _stress(100, "C", chaos=True)
 
 # === SPAWN ENGINE ===
-def spawn_worker():
-    global spawned_trains, spawn_enabled
+DEFAULT_SPAWN_GRAPH = {"stations": {"A":{"lat":28.60,"lon":77.20},"B":{"lat":28.00,"lon":78.00},"C":{"lat":26.90,"lon":80.90},"D":{"lat":27.50,"lon":79.50},"E":{"lat":27.20,"lon":78.80},"F":{"lat":26.50,"lon":79.90}}, "edges": [["A","C"],["A","B"],["B","D"],["D","C"],["B","E"],["E","F"],["F","C"]]}
+
+async def spawn_worker():
     idx = 0
     while True:
         if spawn_enabled and len(spawned_trains) < max_trains:
             # generate one train using current graph
-            g = current_graph if current_graph.get("stations") else {"stations": {"A":{"lat":28.60,"lon":77.20},"B":{"lat":28.00,"lon":78.00},"C":{"lat":26.90,"lon":80.90},"D":{"lat":27.50,"lon":79.50},"E":{"lat":27.20,"lon":78.80},"F":{"lat":26.50,"lon":79.90}}, "edges": [["A","C"],["A","B"],["B","D"],["D","C"],["B","E"],["E","F"],["F","C"]]}
-            stations = list(g.get("stations", {}).keys())
-            if not stations:
-                stations = ["A","B","C","D","E","F"]
-            s = random.choice(stations)
-            d = random.choice(stations)
-            while d == s:
-                d = random.choice(stations)
-            speed = random.randint(60,130)
-            if random.random() < 0.3:
-                speed += random.randint(-30,30)
-            progress = random.random()*0.9
-            lat, lon = g.get("stations", {}).get(s, {"lat":0.0, "lon":0.0})
-            dlat, dlon = g.get("stations", {}).get(d, {"lat":lat, "lon":lon})
-            lat = lat + (dlat - lat) * progress
-            lon = lon + (dlon - lon) * progress
+            g = current_graph if len(current_graph.get("stations", {})) >= 2 else DEFAULT_SPAWN_GRAPH
+            coords = g["stations"]
+            s, d = _rng.sample(list(coords), 2)
+            speed = _rng.randint(60,130)
+            if _rng.random() < 0.3:
+                speed += _rng.randint(-30,30)
+            progress = _rng.random()*0.9
+            src = coords[s]
+            dst = coords[d]
+            lat = src["lat"] + (dst["lat"] - src["lat"]) * progress
+            lon = src["lon"] + (dst["lon"] - src["lon"]) * progress
             new = {
                 "id": f"SP{idx+1:03d}",
                 "name": f"Spawn-{idx+1}",
@@ -570,18 +665,16 @@ def spawn_worker():
                 "path": [s,d],
                 "progress": progress,
                 "speed": speed,
-                "priority": random.randint(1,3),
+                "priority": _rng.randint(1,3),
                 "status": "MOVING",
                 "lat": lat,
                 "lon": lon
             }
-            spawned_trains.append(new)
+            with _spawn_lock:
+                spawned_trains.append(new)
             push_log("INFO", f"Spawned train {new['id']}")
             idx += 1
-        time.sleep(spawn_interval)
-
-_spawn_thread = threading.Thread(target=spawn_worker, daemon=True)
-_spawn_thread.start()
+        await asyncio.sleep(spawn_interval)
 
 @app.post("/spawn/toggle")
 def toggle_spawn(enabled: bool):
@@ -604,24 +697,29 @@ def spawn_config(interval: Optional[int] = None, max_trains_limit: Optional[int]
 
 @app.get("/spawn/trains")
 def get_spawned():
-    return {"trains": spawned_trains, "count": len(spawned_trains)}
+    with _spawn_lock:
+        trains = list(spawned_trains)
+    return {"trains": trains, "count": len(trains)}
 
 @app.delete("/spawn/clear")
 def clear_spawned():
     global spawned_trains
-    c = len(spawned_trains)
-    spawned_trains = []
+    with _spawn_lock:
+        c = len(spawned_trains)
+        spawned_trains = []
     return {"cleared": c, "remaining": 0}
 
 # === LOGS ENDPOINT ===
 @app.get("/logs")
 def get_logs(level: Optional[str]=None, train_id: Optional[str]=None, limit: int=200):
-    logs = logs_buffer
-    if level:
-        logs = [l for l in logs if l["level"] == level.upper()]
-    if train_id:
-        logs = [l for l in logs if l.get("train_id") == train_id]
-    return {"logs": logs[-limit:], "total": len(logs)}
+    key = (level.upper() if level else None, train_id or None)
+    with _logs_lock:
+        logs = logs_buffer if key == (None, None) else _logs_index.get(key, ())
+        if limit > 0:
+            tail = list(islice(reversed(logs), limit))[::-1]  # walks back `limit` entries, no further
+        else:
+            tail = list(logs)[-limit:]  # keep list-slice semantics for limit <= 0
+        return {"logs": tail, "total": len(logs)}
 
 @app.get("/health")
 def health():
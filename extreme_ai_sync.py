@@ -1,17 +1,33 @@
 # extreme_ai_sync.py
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, NamedTuple, Optional, Tuple, Any
+import asyncio
+import contextlib
+import functools
+import json
 import math
-import heapq
+import os
 import random
 import logging
 import threading
 import time
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 
 # IMPORT YOUR 140-PARAM ENGINE (must return (params, contributions, weights))
 from compute140Parameters import compute140Parameters
+from fast_geo import EARTH_R, DEG2RAD, haversine, a_star
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json via JSONResponse
+    orjson = None
 
 # -----------------------------
 # safe wrapper around compute140Parameters
@@ -61,7 +77,111 @@ def compute140_safe(trains, stations, edges):
         # return empty safe defaults so decision logic continues
         return {}, {}, {}
 
-app = FastAPI()
+# -----------------------------
+# memoized compute140_safe: dashboards and the stress front-end re-post identical payloads
+# -----------------------------
+PARAM_CACHE_MAX = 128
+_param_cache: "OrderedDict[tuple, Tuple[dict, dict, dict]]" = OrderedDict()
+_param_cache_lock = threading.Lock()
+
+def _freeze(x):
+    """Hashable, order-normalized form of a JSON-like value (dict keys sorted, lists as tuples)."""
+    if isinstance(x, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in x.items()))
+    if isinstance(x, (list, tuple)):
+        return tuple(_freeze(v) for v in x)
+    return x
+
+# CPU-bound param engine runs in worker processes so it neither holds the GIL nor blocks the event loop.
+# Created by the app lifespan; None outside it (or after a failure), in which case misses run in-process.
+_param_pool: Optional[ProcessPoolExecutor] = None
+
+def _start_param_pool() -> None:
+    global _param_pool
+    # spawn, not fork: forking a running multithreaded server can copy held locks into the workers
+    _param_pool = ProcessPoolExecutor(max_workers=max(1, min(4, os.cpu_count() or 1)), mp_context=get_context("spawn"))
+
+def _stop_param_pool() -> None:
+    global _param_pool
+    pool, _param_pool = _param_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def compute140_cached(trains, stations, edges):
+    """compute140_safe behind an LRU of PARAM_CACHE_MAX payloads; misses run in the param process pool.
+       The engine is deterministic (its randomness is seeded from ids), so an identical payload always
+       yields the same maps."""
+    key = (_freeze(trains), _freeze(stations), _freeze(edges))
+    with _param_cache_lock:
+        hit = _param_cache.get(key)
+        if hit is not None:
+            _param_cache.move_to_end(key)
+            return hit
+    loop = asyncio.get_running_loop()
+    pool = _param_pool
+    try:
+        out = await loop.run_in_executor(pool, compute140_safe, trains, stations, edges)  # None: default executor
+    except Exception as e:
+        if pool is None:
+            raise
+        # a broken pool (killed worker, unpicklable input) must not fail the request: compute in-process
+        logger.warning("param pool unavailable (%s); computing in-process", e)
+        if pool is _param_pool:
+            _stop_param_pool()
+        out = await loop.run_in_executor(None, compute140_safe, trains, stations, edges)
+    with _param_cache_lock:
+        _param_cache[key] = out
+        if len(_param_cache) > PARAM_CACHE_MAX:
+            _param_cache.popitem(last=False)
+    return out
+
+PARAM_SIG_DIGITS = 6  # float32 carries ~7 significant digits; the maps are never read back at full precision
+
+def _quantize(m: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a param map with float values cut to PARAM_SIG_DIGITS significant digits, for the response only:
+       risk scoring keeps using the full-precision maps."""
+    return {k: float(f"{v:.{PARAM_SIG_DIGITS}g}") if type(v) is float else v for k, v in m.items()}
+
+if orjson is not None:
+    class FastJSONResponse(JSONResponse):
+        """JSONResponse rendered by orjson: the 140-entry param maps and 100-train stress payloads
+           are encoded in C instead of field by field."""
+        def render(self, content: Any) -> bytes:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+else:
+    FastJSONResponse = JSONResponse
+
+_dumps = orjson.dumps if orjson is not None else (lambda o: json.dumps(o).encode())
+STREAM_BATCH = 32  # trains per streamed chunk
+
+def _stream_trains(trains: List[Dict[str,Any]], tail: Dict[str,Any]) -> StreamingResponse:
+    """Stream {"trains": [...], **tail} a batch of trains at a time, so the serialized payload is never
+       held whole in memory and the client can start parsing before the last train is encoded."""
+    async def gen():
+        yield b'{"trains":['
+        for k in range(0, len(trains), STREAM_BATCH):
+            yield (b',' if k else b'') + b','.join(_dumps(t) for t in trains[k:k+STREAM_BATCH])
+        yield b']'
+        for key, val in tail.items():
+            yield b',' + _dumps(key) + b':' + _dumps(val)
+        yield b'}'
+    return StreamingResponse(gen(), media_type="application/json")
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the Event belongs to the serving loop, so it is created here rather than at import
+    app.state.spawn_event = asyncio.Event()
+    app.state.spawn_task = asyncio.create_task(spawn_worker())
+    _start_param_pool()
+    try:
+        yield
+    finally:
+        _stop_param_pool()
+        app.state.spawn_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await app.state.spawn_task
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("extreme_ai_sync")
 
@@ -89,16 +209,9 @@ current_trains: List[Dict[str, Any]] = []  # last-known trains (list of dicts)
 spawn_enabled = False
 spawn_interval = 10  # seconds
 max_trains = 100
-spawned_trains: List[Dict[str, Any]] = []
+spawned_trains: deque = deque(maxlen=max_trains)  # hard bound; the spawner also stops at max_trains
 
 # Utility functions
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000.0
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2.0)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2.0)**2
-    return 2.0 * R * math.asin(math.sqrt(a))
-
 def safe_station_coord(stations: Dict[str, Dict[str,float]], name: str, fallback: Tuple[float,float]=(0.0,0.0)):
     """Return (lat, lon) for station name or fallback if missing."""
     s = stations.get(name)
@@ -114,91 +227,121 @@ def edge_length_m(stations: Dict[str, Dict[str,float]], u: str, v: str) -> float
     b = safe_station_coord(stations, v)
     return haversine(a[0], a[1], b[0], b[1])
 
-def dijkstra(stations: Dict[str, Dict[str,float]], edges: List[List[str]], start: str, goal: str, blocked: set = None):
-    if blocked is None:
-        blocked = set()
+@functools.lru_cache(maxsize=8)
+def _adj(stations_key: tuple, edges_key: tuple):
+    """(adjacency, coords) of a graph: {station: [(nbr, great-circle m), ...]} and {station: (lat, lon)}.
+       Keyed by value, so every /decide carrying the synced graph reuses one build."""
+    coords = dict(stations_key)
     # Ensure nodes exist in adjacency (even if they have no coords)
-    adj: Dict[str, List[Tuple[str,float]]] = {}
-    nodes = set()
-    for s in stations.keys():
-        nodes.add(s)
-        adj[s] = []
+    adj: Dict[str, List[Tuple[str,float]]] = {s: [] for s in coords}
     # also include nodes that appear in edges but not in stations
-    for u,v in edges:
-        nodes.add(u); nodes.add(v)
+    for u,v in edges_key:
         if u not in adj: adj[u] = []
         if v not in adj: adj[v] = []
-    for u,v in edges:
-        if (u,v) in blocked or (v,u) in blocked:
-            continue
-        dist = edge_length_m(stations, u, v)
+    for s in adj:
+        coords.setdefault(s, (0.0, 0.0))  # edge_length_m's fallback, so the heuristic matches the weights
+    for u,v in edges_key:
+        a, b = coords[u], coords[v]
+        dist = haversine(a[0], a[1], b[0], b[1])
         adj[u].append((v, dist))
         adj[v].append((u, dist))
-    if start not in adj or goal not in adj:
-        return None
-    pq = [(0.0, start, [start])]
-    seen: Dict[str,float] = {}
-    while pq:
-        d, node, path = heapq.heappop(pq)
-        if node == goal:
-            return path
-        if node in seen and seen[node] <= d:
+    return adj, coords
+
+def dijkstra(stations: Dict[str, Dict[str,float]], edges: List[List[str]], start: str, goal: str, blocked: set = None):
+    """Shortest path from start to goal avoiding the `blocked` edges (either direction), or None.
+       A* over the cached adjacency: weights are great-circle lengths, so the great-circle distance
+       to goal is an admissible heuristic and the search stops well before exploring the whole graph."""
+    adj, coords = _adj(tuple((s, safe_station_coord(stations, s)) for s in stations),
+                       tuple(tuple(e) for e in edges))
+    blocked = {p for u, v in blocked for p in ((u, v), (v, u))} if blocked else None
+    return a_star(adj, coords, start, goal, blocked)
+
+def _path_cum(stations: Dict[str, Dict[str,float]], path: List[str]) -> List[float]:
+    """Cumulative edge lengths along path: cum[0] == 0.0, cum[-1] == total length (m)."""
+    cum = [0.0]
+    total = 0.0
+    for k in range(len(path) - 1):
+        total += edge_length_m(stations, path[k], path[k+1])
+        cum.append(total)
+    return cum
+
+class PredPlan(NamedTuple):
+    """Everything about a train's motion along its path that does not depend on the horizon,
+       resolved once so predicting is a bisect and a lerp per train. field[k] belongs to trains[k]."""
+    lat: List[float]                 # last known position: the fallback for any unusable input
+    lon: List[float]
+    v_ms: List[float]
+    idx: List[int]                   # current edge
+    offset: List[float]              # metres already covered along the path
+    cum: List[Optional[List[float]]]  # edge-length prefix sum, shared by trains on the same path; None: no usable path
+    pts: List[Optional[List[Optional[Tuple[float,float]]]]]  # station coords along the path; None where missing
+
+def _prepare_pred(trains: List[Dict[str,Any]], stations: Dict[str, Dict[str,float]]) -> PredPlan:
+    plan = PredPlan([], [], [], [], [], [], [])
+    paths: Dict[tuple, Tuple[List[float], list]] = {}
+    for train in trains:
+        cum = pts = None
+        v_ms = offset = 0.0
+        idx = 0
+        try:
+            lat, lon = float(train.get("lat",0.0)), float(train.get("lon",0.0))
+        except Exception as e:
+            logger.debug("predict_future_pos fallback: %s", e)
+            lat, lon = 0.0, 0.0
+        try:
+            path = train.get("path")
+            if path and len(path) >= 2:
+                v_ms = max(float(train.get("speed",0.1)), 0.1) * 1000.0 / 3600.0
+                segments = len(path) - 1
+                scaled = min(max(float(train.get("progress", 0.0)), 0.0), 1.0) * segments
+                idx = int(min(int(scaled), segments-1))
+                frac = scaled - idx
+                key = tuple(path)
+                if key not in paths:
+                    paths[key] = (_path_cum(stations, path), [safe_station_coord(stations, s, fallback=None) for s in path])
+                cum, pts = paths[key]
+                offset = cum[idx] + (cum[idx+1] - cum[idx]) * frac
+        except Exception as e:
+            logger.debug("predict_future_pos fallback: %s", e)
+            cum = pts = None
+        plan.lat.append(lat); plan.lon.append(lon); plan.v_ms.append(v_ms)
+        plan.idx.append(idx); plan.offset.append(offset); plan.cum.append(cum); plan.pts.append(pts)
+    return plan
+
+def _predict_prepared(plan: PredPlan, seconds_ahead: float) -> Tuple[List[float], List[float]]:
+    """Predicted (lats, lons) after seconds_ahead for every train of the plan."""
+    out_lat, out_lon = list(plan.lat), list(plan.lon)
+    for k, cum in enumerate(plan.cum):
+        if cum is None:
             continue
-        seen[node] = d
-        for nxt, w in adj.get(node, []):
-            nd = d + w
-            if nxt in seen and seen[nxt] <= nd: continue
-            heapq.heappush(pq, (nd, nxt, path + [nxt]))
-    return None
+        try:
+            pts = plan.pts[k]
+            remaining = plan.v_ms[k] * float(seconds_ahead)
+            # distance along the path once seconds_ahead have elapsed; bisect finds its edge
+            target = plan.offset[k] + remaining
+            if remaining > 0 and target < cum[-1]:
+                e = bisect_right(cum, target, plan.idx[k] + 1) - 1
+                ratio = (target - cum[e]) / (cum[e+1] - cum[e])  # bisect_right never lands on a zero-length edge
+                ua = pts[e] or (plan.lat[k], plan.lon[k])
+                va = pts[e+1] or (plan.lat[k], plan.lon[k])
+                out_lat[k] = ua[0] + (va[0] - ua[0]) * ratio
+                out_lon[k] = ua[1] + (va[1] - ua[1]) * ratio
+            elif pts[-1]:
+                out_lat[k], out_lon[k] = pts[-1]
+        except Exception as e:
+            logger.debug("predict_future_pos fallback: %s", e)
+            out_lat[k], out_lon[k] = plan.lat[k], plan.lon[k]
+    return out_lat, out_lon
+
+def predict_all(trains: List[Dict[str,Any]], stations: Dict[str, Dict[str,float]], seconds_ahead: float) -> List[Tuple[float,float]]:
+    """Linear along path prediction for every train, in input order; tolerates missing stations.
+       If a path node is missing from stations, fallback to last known lat/lon on the train object.
+       Trains sharing a path share one prefix sum of its edge lengths."""
+    return list(zip(*_predict_prepared(_prepare_pred(trains, stations), seconds_ahead)))
 
 def predict_future_pos(train: Dict[str,Any], stations: Dict[str, Dict[str,float]], seconds_ahead: float):
-    """Linear along path prediction that tolerates missing stations.
-       If a path node is missing from stations, fallback to last known lat/lon on the train object."""
-    try:
-        if not train.get("path") or len(train["path"]) < 2:
-            return float(train.get("lat",0.0)), float(train.get("lon",0.0))
-        path = train["path"]
-        speed_ms = max(float(train.get("speed",0.1)), 0.1) * 1000.0 / 3600.0
-        remaining = speed_ms * float(seconds_ahead)
-        segments = len(path) - 1
-        progress = float(train.get("progress", 0.0))
-        scaled = min(max(progress, 0.0), 1.0) * segments
-        idx = int(min(int(scaled), segments-1))
-        frac = scaled - idx
-
-        def station_coord(i):
-            name = path[i]
-            return safe_station_coord(stations, name, fallback=(float(train.get("lat",0.0)), float(train.get("lon",0.0))))
-
-        cur_lat, cur_lon = station_coord(idx)
-        nlat, nlon = station_coord(idx+1)
-        # interpolate
-        cur_lat = cur_lat + (nlat - cur_lat) * frac
-        cur_lon = cur_lon + (nlon - cur_lon) * frac
-
-        edge_idx = idx
-        edge_frac = frac
-        while remaining > 0 and edge_idx < segments:
-            u = path[edge_idx]
-            v = path[edge_idx+1]
-            edge_len = edge_length_m(stations, u, v)
-            rem_on_edge = edge_len * (1.0 - edge_frac)
-            if remaining < rem_on_edge:
-                ratio = (edge_frac * edge_len + remaining) / edge_len if edge_len > 0 else 0.0
-                ua = station_coord(edge_idx)
-                va = station_coord(edge_idx+1)
-                new_lat = ua[0] + (va[0] - va[0]) * ratio
-                new_lon = ua[1] + (va[1] - va[1]) * ratio
-                return new_lat, new_lon
-            remaining -= rem_on_edge
-            edge_idx += 1
-            edge_frac = 0.0
-        last = station_coord(len(path)-1)
-        return last[0], last[1]
-    except Exception as e:
-        # fallback
-        logger.debug("predict_future_pos fallback: %s", e)
-        return float(train.get("lat",0.0)), float(train.get("lon",0.0))
+    """Single-train form of predict_all."""
+    return predict_all([train], stations, seconds_ahead)[0]
 
 def braking_distance_m(train: Dict[str,Any], adhesion_coeff=0.25, decel_override=None):
     v = max(float(train.get("speed", 0.1)), 0.1) * 1000.0 / 3600.0
@@ -210,14 +353,98 @@ def braking_distance_m(train: Dict[str,Any], adhesion_coeff=0.25, decel_override
         return 1e9
     return (v*v) / (2.0 * a)
 
+class Fleet(NamedTuple):
+    """Struct-of-arrays view of the trains of one request: field[k] belongs to trains[k]."""
+    ids: List[str]
+    cur_lat: List[float]
+    cur_lon: List[float]
+    fut_lat: List[float]      # predicted position at LOOKAHEAD
+    fut_lon: List[float]
+    speed_ms: List[float]
+    brake: List[float]        # braking distance (m)
+    brake_score: List[float]
+
+def _finite(x: float, nan: float = 0.0, lim: float = 1e9) -> float:
+    """x with NaN replaced and infinities clipped to +-lim, so no math below can raise on it."""
+    if x != x:
+        return nan
+    return lim if x > lim else -lim if x < -lim else x
+
+def _fleet_arrays(trains: List[Dict[str,Any]], stations: Dict[str, Dict[str,float]]) -> Fleet:
+    """Per-train terms of the pair score, computed once per train instead of once per pair, so the
+       pair loop indexes flat lists instead of hashing dict keys.
+       The pair braking score is f(min(brakeA, brakeB)) for a non-increasing f, i.e. max(f(brakeA), f(brakeB)),
+       so each train's f is evaluated here and a pair only takes the max.
+       Every value is finite (see _finite): the pair loop runs without a per-pair try/except.
+       lat/lon/speed are not passed through float(): /decide gets them from TrainModel, already floats."""
+    fut_lat, fut_lon = _predict_prepared(_prepare_pred(trains, stations), LOOKAHEAD)
+    brake = [braking_distance_m(t) for t in trains]
+    return Fleet(
+        ids=[t["id"] for t in trains],
+        cur_lat=[_finite(t["lat"]) for t in trains],
+        cur_lon=[_finite(t["lon"]) for t in trains],
+        fut_lat=[_finite(x) for x in fut_lat],
+        fut_lon=[_finite(x) for x in fut_lon],
+        speed_ms=[max(_finite(t.get("speed",0.1), 0.1), 0.1) * 1000.0/3600.0 for t in trains],
+        brake=brake,
+        brake_score=[max(0.0, 1.0 - (b / (SAFE_DISTANCE * 2.0))) for b in brake])
+
+def _score_radius_m(speed_ms: List[float]) -> float:
+    """Predicted separation beyond which both proximity_score and ttc_score are exactly zero for any pair:
+       2*SAFE_DISTANCE for proximity, and the largest relative speed times the 2*LOOKAHEAD TTC horizon."""
+    if not speed_ms:
+        return 2.0 * SAFE_DISTANCE
+    max_rel = max(speed_ms) - min(speed_ms) + 1e-6
+    return max(2.0 * SAFE_DISTANCE, 2.0 * LOOKAHEAD * max_rel)
+
+def _lat_bands(lats: List[float], radius_m: float) -> List[int]:
+    """Uniform latitude-band grid of cell height radius_m over the predicted positions.
+       Great-circle distance is never below R*|dlat|, so two trains whose bands differ by more than one
+       are more than radius_m apart. The 1e-6 slack absorbs rounding; non-finite input puts everyone in one band."""
+    cell = radius_m * (1.0 + 1e-6) / (EARTH_R * DEG2RAD)  # band height in degrees
+    try:
+        return [math.floor(lat / cell) for lat in lats]
+    except (ValueError, OverflowError):
+        return [0] * len(lats)
+
+def _best_far_pair(band: List[int], members: Dict[int, List[int]], score: List[float]) -> Optional[Tuple[int, int]]:
+    """First pair (i, j), i < j, in (i, j) order among the pairs more than one band apart that maximise
+       max(score[i], score[j]); None when every pair is within one band. O(n log n): pairs are never walked."""
+    n = len(band)
+    near = {b: sum(len(members.get(x, ())) for x in (b - 1, b, b + 1)) for b in members}
+    has_far = [near[b] < n for b in band]
+    top = max((s for s, f in zip(score, has_far) if f), default=None)
+    if top is None:
+        return None
+    # every far pair touching a `tops` train scores top, and only those do
+    tops = [k for k in range(n) if has_far[k] and score[k] == top]
+    tops_in = defaultdict(list)
+    for k in tops:
+        tops_in[band[k]].append(k)
+    is_top = set(tops)
+    for i in range(n):
+        b = band[i]
+        if i in is_top:
+            # i pairs with any later far train
+            near_after = sum(len(ks) - bisect_right(ks, i) for ks in (members.get(x, ()) for x in (b - 1, b, b + 1)))
+            found = n - 1 - i > near_after
+        else:
+            # i pairs with a later far tops train
+            near_after = sum(len(ks) - bisect_right(ks, i) for ks in (tops_in.get(x, ()) for x in (b - 1, b, b + 1)))
+            found = len(tops) - bisect_right(tops, i) > near_after
+        if found:
+            return i, next(j for j in range(i + 1, n) if abs(band[j] - b) > 1 and (i in is_top or j in is_top))
+    return None
+
 # Monte Carlo helper (kept lightweight)
-def monte_carlo_risk_eval(base_score, uncertainty_sd=0.12, sims=MONTE_SIMS):
-    count = 0
-    for _ in range(sims):
-        sample = random.gauss(base_score, uncertainty_sd)
-        if sample > RISK_THRESHOLD:
-            count += 1
-    return count / max(1, sims)
+def monte_carlo_risk_eval(uncertainty_sd=0.12, sims=MONTE_SIMS):
+    """Draw one sorted batch of N(0, sd) noise and return prob(base_score) = P(base_score + noise > RISK_THRESHOLD).
+       Every pair of a request is scored against the same batch, so each call is a bisect, not `sims` draws."""
+    noise = sorted(random.gauss(0.0, uncertainty_sd) for _ in range(sims))
+    denom = max(1, sims)
+    def prob(base_score):
+        return (sims - bisect_right(noise, RISK_THRESHOLD - base_score)) / denom
+    return prob
 
 # Pydantic models for incoming payloads
 class TrainModel(BaseModel):
@@ -245,11 +472,109 @@ class ApplyModel(BaseModel):
     train_id: str
     new_path: List[str]
 
+def _pair_phase(trains: List[Dict[str,Any]], fleet: Fleet, contribs_map: Dict[str,float], weights_map: Dict[str,float]) -> Dict[str,Any]:
+    """Score every pair and return {"score", "pair", "details"} for the highest blended risk.
+       Ties go to the first pair in (i, j) order, as a plain double loop over the pairs would pick."""
+    best = 0.0
+    best_i = best_j = -1  # the loops only track the leader; its details are built once, after them
+    n = len(trains)
+    if n < 2:
+        return {"score": 0.0, "pair": None, "details": None}
+    ids, cur_lat, cur_lon, fut_lat, fut_lon, speed_ms, brake, brake_score = fleet
+    # Broad phase: trains more than one band apart are beyond the radius where proximity and TTC score zero,
+    # so only same- and adjacent-band pairs are scored one by one
+    band = _lat_bands(fut_lat, _score_radius_m(speed_ms))
+    members = defaultdict(list)  # band -> train indices, ascending
+    for k, b in enumerate(band):
+        members[b].append(k)
+    mc_prob = monte_carlo_risk_eval(uncertainty_sd=0.12)
+    # pair-invariant terms, hoisted out of the pair loop
+    total_w = sum(weights_map.values()) if weights_map else 1.0
+    paramRisk = sum(contribs_map.values()) / total_w if total_w > 0 else 0.0
+    safe2 = SAFE_DISTANCE * 2.0
+    horizon = LOOKAHEAD * 2.0
+    for i in range(n):
+        a_lat = fut_lat[i]
+        a_lon = fut_lon[i]
+        vA = speed_ms[i]
+        bsA = brake_score[i]
+        bandA = band[i]
+        for ks in (members.get(bandA - 1), members[bandA], members.get(bandA + 1)):
+            if not ks:
+                continue
+            for j in islice(ks, bisect_right(ks, i), None):
+                fut_dist = haversine(a_lat, a_lon, fut_lat[j], fut_lon[j])
+                rel = abs(vA - speed_ms[j]) + 1e-6
+                ttc = fut_dist / rel if rel > 0 else math.inf
+                proximity_score = max(0.0, 1.0 - (fut_dist / safe2))
+                ttc_score = max(0.0, 1.0 - min(ttc / horizon, 1.0))
+                bsB = brake_score[j]
+                braking_score = bsA if bsA >= bsB else bsB
+
+                base_score = 0.33*proximity_score + 0.33*ttc_score + 0.34*braking_score
+
+                final = max(0.0, min(1.0, 0.6*base_score + 0.4*paramRisk))
+
+                # Monte Carlo blend
+                mc = mc_prob(final)
+                blended = 0.8*final + 0.2*mc
+                blended = max(0.0, min(1.0, blended))
+
+                # the three bands are visited out of j order, so a tie within row i goes to the smaller j
+                if blended > best or (blended == best and best_i == i and j < best_j):
+                    best, best_i, best_j = blended, i, j
+                    best_terms = (proximity_score, ttc_score, braking_score, base_score, mc)
+    # Far pairs: their proximity and TTC scores are 0, so blended is a non-decreasing function g of the
+    # braking score alone (mc_prob is monotone over the shared noise batch). As the pair braking score is
+    # max(bsA, bsB), a far pair scores max(g(bsA), g(bsB)): one g per train settles every far pair at once.
+    far_score = []
+    for bs in brake_score:
+        base_score = 0.33*0.0 + 0.33*0.0 + 0.34*bs
+        final = max(0.0, min(1.0, 0.6*base_score + 0.4*paramRisk))
+        blended = 0.8*final + 0.2*mc_prob(final)
+        far_score.append(max(0.0, min(1.0, blended)))
+    far = _best_far_pair(band, members, far_score)
+    if far is not None:
+        i, j = far
+        blended = far_score[i] if far_score[i] >= far_score[j] else far_score[j]
+        if blended > best or (blended == best and best_i >= 0 and far < (best_i, best_j)):
+            braking_score = brake_score[i] if brake_score[i] >= brake_score[j] else brake_score[j]
+            base_score = 0.33*0.0 + 0.33*0.0 + 0.34*braking_score
+            final = max(0.0, min(1.0, 0.6*base_score + 0.4*paramRisk))
+            best, best_i, best_j = blended, i, j
+            best_terms = (0.0, 0.0, braking_score, base_score, mc_prob(final))
+    if best_i < 0:
+        return {"score": 0.0, "pair": None, "details": None}
+
+    i, j = best_i, best_j
+    proximity_score, ttc_score, braking_score, base_score, mc = best_terms
+    # same expressions as the loop, so a near winner gets back the exact values it was scored with
+    fut_dist = haversine(fut_lat[i], fut_lon[i], fut_lat[j], fut_lon[j])
+    rel = abs(speed_ms[i] - speed_ms[j]) + 1e-6
+    ttc = fut_dist / rel if rel > 0 else math.inf
+    details = {
+        "pair": (ids[i], ids[j]),
+        "cur_dist_m": haversine(cur_lat[i], cur_lon[i], cur_lat[j], cur_lon[j]),
+        "future_dist_m": fut_dist,
+        "ttc_s": ttc,
+        "brake_A_m": brake[i],
+        "brake_B_m": brake[j],
+        "proximity_score": proximity_score,
+        "ttc_score": ttc_score,
+        "braking_score": braking_score,
+        "paramRisk": paramRisk,
+        "base_score": base_score,
+        "mc_prob": mc,
+        "final_score": best
+    }
+    # the AoS dicts are only touched to shape the response
+    return {"score": best, "pair": (trains[i], trains[j]), "details": details}
+
 # ===========================
 # Core /decide endpoint (AUTO-SYNC)
 # ===========================
 @app.post("/decide")
-def decide(data: InputModel):
+async def decide(data: InputModel):
     global current_graph, current_trains
     # 1) Auto-sync the graph & trains
     try:
@@ -265,68 +590,19 @@ def decide(data: InputModel):
     current_graph = {"stations": stations, "edges": edges}
     current_trains = trains
 
+    # the param engine and the per-train geometry are independent: run them side by side
+    loop = asyncio.get_running_loop()
     try:
-        params_map, contribs_map, weights_map = compute140_safe(trains, stations, edges)
+        (params_map, contribs_map, weights_map), fleet = await asyncio.gather(
+            compute140_cached(trains, stations, edges),
+            loop.run_in_executor(None, _fleet_arrays, trains, stations))
     except Exception as e:
         # Should not happen due to wrapper, but keep safe guard
         logger.exception("Unexpected error when computing params: %s", e)
         raise HTTPException(status_code=500, detail="Parameter engine failure")
 
-    # pairwise evaluation
-    highest = {"score": 0.0, "pair": None, "details": None}
-    n = len(trains)
-    for i in range(n):
-        for j in range(i+1, n):
-            A = trains[i]; B = trains[j]
-            try:
-                cur_dist = haversine(float(A["lat"]), float(A["lon"]), float(B["lat"]), float(B["lon"]))
-                a_lat, a_lon = predict_future_pos(A, stations, LOOKAHEAD)
-                b_lat, b_lon = predict_future_pos(B, stations, LOOKAHEAD)
-                fut_dist = haversine(a_lat, a_lon, b_lat, b_lon)
-                vA = max(float(A.get("speed",0.1)), 0.1) * 1000.0/3600.0
-                vB = max(float(B.get("speed",0.1)), 0.1) * 1000.0/3600.0
-                rel = abs(vA - vB) + 1e-6
-                ttc = fut_dist / rel if rel > 0 else float("inf")
-                brakeA = braking_distance_m(A)
-                brakeB = braking_distance_m(B)
-
-                proximity_score = max(0.0, 1.0 - (fut_dist / (SAFE_DISTANCE * 2.0)))
-                ttc_score = max(0.0, 1.0 - min(ttc / (LOOKAHEAD * 2.0), 1.0))
-                braking_score = max(0.0, 1.0 - (min(brakeA, brakeB) / (SAFE_DISTANCE * 2.0)))
-
-                base_score = 0.33*proximity_score + 0.33*ttc_score + 0.34*braking_score
-
-                total_w = sum(weights_map.values()) if weights_map else 1.0
-                paramRisk = sum(contribs_map.values()) / total_w if total_w > 0 else 0.0
-
-                final = max(0.0, min(1.0, 0.6*base_score + 0.4*paramRisk))
-
-                # Monte Carlo blend
-                mc = monte_carlo_risk_eval(final, uncertainty_sd=0.12)
-                blended = 0.8*final + 0.2*mc
-                blended = max(0.0, min(1.0, blended))
-
-                details = {
-                    "pair": (A["id"], B["id"]),
-                    "cur_dist_m": cur_dist,
-                    "future_dist_m": fut_dist,
-                    "ttc_s": ttc,
-                    "brake_A_m": brakeA,
-                    "brake_B_m": brakeB,
-                    "proximity_score": proximity_score,
-                    "ttc_score": ttc_score,
-                    "braking_score": braking_score,
-                    "paramRisk": paramRisk,
-                    "base_score": base_score,
-                    "mc_prob": mc,
-                    "final_score": blended
-                }
-
-                if blended > highest["score"]:
-                    highest = {"score": blended, "pair": (A,B), "details": details}
-            except Exception as e:
-                logger.debug("pairwise eval error for %s-%s: %s", A.get("id"), B.get("id"), e)
-                continue
+    # pairwise evaluation (CPU-bound: off the event loop)
+    highest = await loop.run_in_executor(None, _pair_phase, trains, fleet, contribs_map, weights_map)
 
     # Decision logic
     if highest["score"] >= RISK_THRESHOLD and highest["pair"]:
@@ -359,7 +635,8 @@ def decide(data: InputModel):
         if blocked_edge:
             blocked_set.add(tuple(blocked_edge))
         try:
-            new_path = dijkstra(stations, edges, low["path"][idx] if idx is not None else low.get("source", low.get("path",[None])[0]), low.get("destination"), blocked=blocked_set)
+            start = low["path"][idx] if idx is not None else low.get("source", low.get("path",[None])[0])
+            new_path = await loop.run_in_executor(None, functools.partial(dijkstra, stations, edges, start, low.get("destination"), blocked=blocked_set))
         except Exception as e:
             logger.debug("dijkstra reroute error: %s", e)
             new_path = None
@@ -372,9 +649,9 @@ def decide(data: InputModel):
             "blocked_edge": blocked_edge,
             "reason": reason,
             "details": highest,
-            "params": params_map,
-            "param_contributions": contribs_map,
-            "param_weights": weights_map
+            "params": _quantize(params_map),
+            "param_contributions": _quantize(contribs_map),
+            "param_weights": _quantize(weights_map)
         }
         # add a log entry
         logger.warning("Decision: %s - train %s - score %.3f", response["action"], low.get("id"), highest["score"])
@@ -385,9 +662,9 @@ def decide(data: InputModel):
         "action": "NORMAL",
         "reason": "All clear",
         "score": highest["score"],
-        "params": params_map,
-        "param_contributions": contribs_map,
-        "param_weights": weights_map
+        "params": _quantize(params_map),
+        "param_contributions": _quantize(contribs_map),
+        "param_weights": _quantize(weights_map)
     }
 
 # Apply reroute (unchanged)
@@ -431,19 +708,25 @@ def generate_stress_trains(count:int, chaos:bool=False, graph=None):
     stations = list(g.get("stations",{}).keys())
     if not stations:
         stations = ["A","B","C","D","E","F"]
+    m = len(stations)
+    coords = [safe_station_coord(g.get("stations",{}), s, fallback=None) for s in stations]  # once per station, not per train
+    randrange, rand = random.randrange, random.random
     trains=[]
     for i in range(count):
-        s = random.choice(stations)
-        d = random.choice(stations)
-        while d == s:
-            d = random.choice(stations)
-        speed = random.randint(60,130)
+        si = randrange(m)
+        # destination drawn from the other m-1 stations directly: no retry loop (which never ended for m == 1)
+        di = si
+        if m > 1:
+            di = randrange(m - 1)
+            di += di >= si
+        s, d = stations[si], stations[di]
+        speed = randrange(60, 131)
         if chaos:
-            speed += random.randint(-30,30)
-        progress = random.random()*0.9
-        lat, lon = safe_station_coord(g.get("stations",{}), s, fallback=(0.0,0.0))
+            speed += randrange(-30, 31)
+        progress = rand()*0.9
+        lat, lon = coords[si] or (0.0, 0.0)
         # simple linear interp to destination
-        dlat, dlon = safe_station_coord(g.get("stations",{}), d, fallback=(lat,lon))
+        dlat, dlon = coords[di] or (lat, lon)
         lat = lat + (dlat - lat) * progress
         lon = lon + (dlon - lon) * progress
         trains.append({
@@ -454,7 +737,7 @@ def generate_stress_trains(count:int, chaos:bool=False, graph=None):
             "path": [s,d],
             "progress": progress,
             "speed": speed,
-            "priority": random.randint(1,3),
+            "priority": randrange(1, 4),
             "status": "MOVING",
             "lat": lat,
             "lon": lon
@@ -471,7 +754,7 @@ def stress_test_50():
 def stress_test_100():
     graph = current_graph if current_graph.get("stations") else _default_graph()
     trains = generate_stress_trains(100, chaos=True, graph=graph)
-    return {"trains": trains, "graph": graph}
+    return _stream_trains(trains, {"graph": graph})
 
 @app.post("/sync")
 def sync_graph(data: GraphModel):
@@ -491,32 +774,33 @@ def sync_graph(data: GraphModel):
 def stress_test_50_payload():
     graph = current_graph if current_graph.get("stations") else _default_graph()
     trains = generate_stress_trains(50, chaos=False, graph=graph)
-    # sample /decide payload
-    sample_payload = {"trains": trains, "graph": graph}
-    return {"stress_trains": trains, "graph": graph, "sample_decide_payload": sample_payload}
+    # sample /decide payload; the trains and graph are sent once, not once per key
+    return {"sample_decide_payload": {"trains": trains, "graph": graph}}
 
 # ---------------------------#
-# Spawn engine (daemon thread) — uses latest graph
+# Spawn engine (asyncio task) — uses latest graph
 # ---------------------------#
-def spawn_worker():
-    global spawned_trains, spawn_enabled
-    idx = 0
+async def spawn_worker():
+    event = app.state.spawn_event  # set while spawning is enabled; the spawner parks on it otherwise
     while True:
+        await event.wait()  # no wakeups at all while spawning is off
+        await asyncio.sleep(spawn_interval)
         if spawn_enabled and len(spawned_trains) < max_trains:
             # generate one train using current graph
             g = current_graph if current_graph.get("stations") else _default_graph()
             new = generate_stress_trains(1, chaos=True, graph=g)[0]
             spawned_trains.append(new)
             logger.info("Spawned train %s (total %d)", new["id"], len(spawned_trains))
-        time.sleep(spawn_interval)
-
-_spawn_thread = threading.Thread(target=spawn_worker, daemon=True)
-_spawn_thread.start()
 
 @app.post("/spawn/toggle")
-def toggle_spawn(enabled: bool):
+async def toggle_spawn(enabled: bool):
+    # async so the Event is set/cleared on the loop thread that waits on it
     global spawn_enabled
     spawn_enabled = bool(enabled)
+    if spawn_enabled:
+        app.state.spawn_event.set()
+    else:
+        app.state.spawn_event.clear()
     return {"spawn_enabled": spawn_enabled, "interval_seconds": spawn_interval, "max_trains": max_trains}
 
 @app.get("/spawn/status")
@@ -524,43 +808,57 @@ def spawn_status():
     return {"enabled": spawn_enabled, "interval_seconds": spawn_interval, "max_trains": max_trains, "spawned_count": len(spawned_trains)}
 
 @app.post("/spawn/config")
-def spawn_config(interval: Optional[int] = None, max_trains_limit: Optional[int] = None):
-    global spawn_interval, max_trains
+async def spawn_config(interval: Optional[int] = None, max_trains_limit: Optional[int] = None):
+    # async so the deque is swapped on the loop thread the spawner appends from: no append can land in the old one
+    global spawn_interval, max_trains, spawned_trains
     if interval is not None:
         spawn_interval = max(1, int(interval))
     if max_trains_limit is not None:
         max_trains = max(1, int(max_trains_limit))
+        spawned_trains = deque(spawned_trains, maxlen=max_trains)  # keeps the newest on a shrink
     return {"interval_seconds": spawn_interval, "max_trains": max_trains}
 
 @app.get("/spawn/trains")
 def get_spawned():
-    return {"trains": spawned_trains, "count": len(spawned_trains)}
+    trains = list(spawned_trains)  # snapshot: the spawner may append while the response streams
+    return _stream_trains(trains, {"count": len(trains)})
 
 @app.delete("/spawn/clear")
 def clear_spawned():
-    global spawned_trains
     c = len(spawned_trains)
-    spawned_trains = []
+    spawned_trains.clear()
     return {"cleared": c, "remaining": 0}
 
 # ---------------------------#
 # Basic in-memory logs
 # ---------------------------#
-logs_buffer = []
 MAX_LOGS = 2000
+logs_buffer: deque = deque(maxlen=MAX_LOGS)  # append drops the oldest entry in O(1)
+_logs_lock = threading.Lock()  # deques raise if mutated while get_logs iterates them
+
 def push_log(level:str, message:str, train_id:Optional[str]=None):
-    logs_buffer.append({"ts": time.time(), "level": level.upper(), "msg": message, "train_id": train_id})
-    if len(logs_buffer) > MAX_LOGS:
-        logs_buffer.pop(0)
+    with _logs_lock:
+        logs_buffer.append({"ts": time.time(), "level": level.upper(), "msg": message, "train_id": train_id})
 
 @app.get("/logs")
 def get_logs(level: Optional[str]=None, train_id: Optional[str]=None, limit: int=200):
-    logs = logs_buffer
-    if level:
-        logs = [l for l in logs if l["level"] == level.upper()]
-    if train_id:
-        logs = [l for l in logs if l.get("train_id") == train_id]
-    return {"logs": logs[-limit:], "total": len(logs)}
+    lvl = level.upper() if level else None
+    with _logs_lock:
+        if limit <= 0:  # odd slice semantics of logs[-limit:]; not worth a fast path
+            logs = [l for l in logs_buffer if (not lvl or l["level"] == lvl) and (not train_id or l.get("train_id") == train_id)]
+            return {"logs": logs[-limit:], "total": len(logs)}
+        if not lvl and not train_id:
+            tail = list(islice(reversed(logs_buffer), limit))
+            total = len(logs_buffer)
+        else:
+            # one pass from the newest end: keep the first `limit` matches, only count the rest
+            tail, total = [], 0
+            for l in reversed(logs_buffer):
+                if (lvl and l["level"] != lvl) or (train_id and l.get("train_id") != train_id): continue
+                total += 1
+                if len(tail) < limit: tail.append(l)
+    tail.reverse()
+    return {"logs": tail, "total": total}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,172 @@
+# fast_geo.py
+"""
+Great-circle distance and shortest-path helpers shared by the AI servers.
+
+Usage:
+    from fast_geo import haversine, a_star, to_csr, shortest_path_csr
+
+    d = haversine(lat1, lon1, lat2, lon2)           # meters
+    path = a_star(adj, coords, "NDLS", "HWH")       # adj: { node: [(nbr, weight), ...] }, coords: { node: (lat, lon) }
+
+    g = to_csr(adj)                                 # integer form, built once per graph
+    idx_path = shortest_path_csr(g, g.index["NDLS"], g.index["HWH"])
+    path = [g.names[k] for k in idx_path]
+
+Notes:
+- haversine uses the asin form, clamped so rounding can never push asin out of its domain
+- a_star is only exact when every weight is at least the haversine distance between its endpoints' coords
+- shortest_path_csr is Dijkstra over int node ids with a predecessor list: no string hashing in the loop;
+  pass radix=True only for integer weights
+"""
+
+import heapq
+import math
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+EARTH_R = 6371000.0
+DEG2RAD = math.pi / 180.0
+
+# -------------------------
+# Distance
+# -------------------------
+def haversine(lat1, lon1, lat2, lon2, _sin=math.sin, _cos=math.cos, _asin=math.asin, _sqrt=math.sqrt):
+    """Return distance in meters between two lat/lon points.
+    The math functions are bound as defaults so each call does local, not global+attribute, lookups."""
+    Δφ = DEG2RAD * (lat2 - lat1)
+    Δλ = DEG2RAD * (lon2 - lon1)
+    a = _sin(Δφ/2)**2 + _cos(DEG2RAD * lat1) * _cos(DEG2RAD * lat2) * _sin(Δλ/2)**2
+    return 2 * EARTH_R * _asin(min(1.0, _sqrt(a)))
+
+# -------------------------
+# Priority queues
+# -------------------------
+class RadixHeap:
+    """Monotone priority queue for non-negative integer keys (Ahuja et al. radix heap).
+    Keys pushed must never be smaller than the last extracted key, which holds for Dijkstra."""
+    def __init__(self):
+        self.last = 0
+        self.size = 0
+        self.buckets = [[] for _ in range(65)]
+
+    def __len__(self):
+        return self.size
+
+    def push(self, key, item):
+        self.buckets[(key ^ self.last).bit_length()].append((key, item))
+        self.size += 1
+
+    def extract_min(self):
+        if not self.buckets[0]:
+            i = 1
+            while not self.buckets[i]: i += 1
+            bucket, self.buckets[i] = self.buckets[i], []
+            self.last = min(bucket, key=lambda e: e[0])[0]
+            for entry in bucket:
+                self.buckets[(entry[0] ^ self.last).bit_length()].append(entry)
+        self.size -= 1
+        return self.buckets[0].pop()
+
+class BinaryHeap:
+    """heapq behind the RadixHeap interface."""
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, key, item):
+        heapq.heappush(self.heap, (key, item))
+
+    def extract_min(self):
+        return heapq.heappop(self.heap)
+
+# -------------------------
+# Shortest path
+# -------------------------
+def a_star(adj: Dict[str, List[Tuple[str, float]]], coords: Dict[str, Tuple[float, float]], start: str, goal: str,
+           blocked: Optional[set] = None) -> Optional[List[str]]:
+    """A* over a prebuilt adjacency with the great-circle distance to goal as heuristic.
+    coords must cover every node; `blocked` holds (u, v) tuples and is checked as given, so list both directions.
+    A node whose cost improves after expansion is expanded again, so rounding in the heuristic cannot cost optimality."""
+    if start not in adj or goal not in adj: return None
+    glat, glon = coords[goal]
+    h = {}  # heuristic per node, computed on first push
+    def hv(node):
+        if node not in h:
+            lat, lon = coords[node]
+            h[node] = haversine(lat, lon, glat, glon)
+        return h[node]
+    pq = [(hv(start), 0, start)]
+    dist = {start: 0}
+    prev = {start: None}
+    while pq:
+        _, d, node = heapq.heappop(pq)
+        if d > dist[node]: continue
+        if node == goal:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = prev[node]
+            return path[::-1]
+        for nxt, w in adj[node]:
+            if blocked and (node, nxt) in blocked: continue
+            nd = d + w
+            if nd < dist.get(nxt, float('inf')):
+                dist[nxt] = nd
+                prev[nxt] = node
+                heapq.heappush(pq, (nd + hv(nxt), nd, nxt))
+    return None
+
+# -------------------------
+# CSR graphs
+# -------------------------
+class CsrGraph(NamedTuple):
+    names: List[str]        # node id -> station name
+    index: Dict[str, int]   # station name -> node id
+    indptr: List[int]       # neighbours of node u are indices[indptr[u]:indptr[u+1]]
+    indices: List[int]
+    weights: List[float]
+
+def to_csr(adj: Dict[str, List[Tuple[str, float]]]) -> CsrGraph:
+    """Compressed sparse row form of an adjacency dict; neighbour order is preserved."""
+    names = list(adj)
+    index = {s: k for k, s in enumerate(names)}
+    indptr, indices, weights = [0], [], []
+    for s in names:
+        for nxt, w in adj[s]:
+            indices.append(index[nxt])
+            weights.append(w)
+        indptr.append(len(indices))
+    return CsrGraph(names, index, indptr, indices, weights)
+
+def shortest_path_csr(g: CsrGraph, src: int, dst: int,
+                      blocked_edge: Tuple[int, int] = (-1, -1), radix: bool = False) -> Optional[List[int]]:
+    """Dijkstra over a CsrGraph, skipping `blocked_edge` in either direction: node ids in, node ids out
+    (None if unreachable).
+    dist/prev are flat lists indexed by node id, so the loop does no hashing."""
+    indptr, indices, weights = g.indptr, g.indices, g.weights
+    bu, bv = blocked_edge
+    dist = [float('inf')] * len(g.names)
+    prev = [-1] * len(g.names)
+    dist[src] = 0
+    pq = RadixHeap() if radix else BinaryHeap()
+    push, pop = pq.push, pq.extract_min
+    push(0, src)
+    while pq:
+        d, u = pop()
+        if d > dist[u]: continue
+        if u == dst:
+            path = []
+            while u != -1:
+                path.append(u)
+                u = prev[u]
+            return path[::-1]
+        for k in range(indptr[u], indptr[u+1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd < dist[v]:
+                if (u == bu and v == bv) or (u == bv and v == bu): continue
+                dist[v] = nd
+                prev[v] = u
+                push(nd, v)
+    return None
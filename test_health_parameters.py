@@ -4,8 +4,11 @@ Thorough test suite for computeHealthParameters.py integration
 """
 
 import json
+import os
 import time
 import sys
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Dict, List
 
 # Import the modules to test
@@ -217,6 +220,20 @@ def test_performance():
         else:
             print("✓ Performance acceptable")
 
+        # Trains are independent, so chunked runs must merge to exactly the serial result
+        workers = os.cpu_count() or 1
+        size = -(-len(large_trains) // workers)
+        chunks = [large_trains[k:k + size] for k in range(0, len(large_trains), size)]
+        for pool_cls in (ThreadPoolExecutor, ProcessPoolExecutor):
+            start_time = time.time()
+            with pool_cls(max_workers=workers) as ex:
+                merged = dict(ChainMap(*ex.map(compute_health_parameters, chunks)))
+            duration = time.time() - start_time
+            if merged != health_params:
+                print(f"✗ {pool_cls.__name__} result differs from the serial result")
+                return False
+            print(f"✓ {pool_cls.__name__} ({workers} workers) matched serial in {duration:.3f} seconds")
+
         return True
 
     except Exception as e:
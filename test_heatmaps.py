@@ -1,5 +1,16 @@
 import requests
 import json
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:  # optional: stdlib json
+    _dumps = lambda o: json.dumps(o).encode()
+
+# One pooled session: every call below reuses the same keep-alive socket to the server
+S = requests.Session()
+S.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
 
 # Test the heatmap functionality by simulating train deployment and checking parameters
 
@@ -8,7 +19,7 @@ def test_heatmaps():
 
     # First, check initial parameters (should be minimal)
     try:
-        response = requests.get('http://localhost:8001/parameters_full', timeout=5)
+        response = S.get('http://localhost:8001/parameters_full', timeout=5)
         initial_data = response.json()
         print(f"Initial parameters: {len(initial_data)} keys")
         print(f"Initial trains: {len(initial_data.get('trains', []))}")
@@ -19,7 +30,7 @@ def test_heatmaps():
     # Simulate deploying trains by calling the stress test endpoint
     try:
         print("\nDeploying test trains...")
-        stress_response = requests.get('http://localhost:8001/stress_test_50', timeout=10)
+        stress_response = S.get('http://localhost:8001/stress_test_50', timeout=10)
         stress_data = stress_response.json()
         trains = stress_data.get('trains', [])
         print(f"Generated {len(trains)} test trains")
@@ -64,14 +75,15 @@ def test_heatmaps():
         }
 
         print(f"Sending {len(test_trains)} trains to decision engine...")
-        decide_response = requests.post('http://localhost:8001/decide',
-                                      json=decide_payload, timeout=15)
+        decide_response = S.post('http://localhost:8001/decide',
+                                 data=_dumps(decide_payload),
+                                 headers={'Content-Type': 'application/json'}, timeout=15)
         decide_data = decide_response.json()
         print(f"Decision result: {decide_data.get('action', 'UNKNOWN')}")
 
         # Now check parameters again
         print("\nChecking parameters after train deployment...")
-        params_response = requests.get('http://localhost:8001/parameters_full', timeout=5)
+        params_response = S.get('http://localhost:8001/parameters_full', timeout=5)
         final_data = params_response.json()
 
         print(f"Final parameters keys: {len(final_data)}")
@@ -1,13 +1,15 @@
 import json
 from computeNetworkLoadParameters import compute_network_load_parameters
 
+PARAM_KEYS_41_60 = tuple(f"p{i}" for i in range(41, 61))
+
 # Load test data
 with open('test_data.json', 'r') as f:
     data = json.load(f)
 
 trains = data['trains']
 stations = list(data['graph']['stations'].keys())
-edges = [{'source': e[0], 'target': e[1]} for e in data['graph']['edges']]
+edges = [{'source': u, 'target': v} for u, v in data['graph']['edges']]
 
 # Test the function
 results = compute_network_load_parameters(trains, stations, edges)
@@ -22,7 +24,7 @@ if results:
     sample_train = list(results.keys())[0]
     sample_params = results[sample_train]
     print(f"Sample train {sample_train} parameters: {list(sample_params.keys())}")
-    print(f"All params present: {all(f'p{i}' in sample_params for i in range(41, 61))}")
+    print(f"All params present: {all(k in sample_params for k in PARAM_KEYS_41_60)}")
 
     # Check ranges
     all_in_range = all(0 <= v <= 1 for v in sample_params.values())
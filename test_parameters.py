@@ -1,20 +1,43 @@
+import json
+from operator import itemgetter
+
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional: stdlib json
+    _loads = json.loads
+
+# key tuples built once; missing keys read as 0 (a mapping with a default keeps itemgetter's single C-level fetch)
+P1_P10_KEYS = tuple(f'P{i}' for i in range(1, 11))
+P11_P20_KEYS = tuple(f'P{i}' for i in range(11, 21))
+P31_P40_KEYS = tuple(f'P{i}' for i in range(31, 41))
+
+class _ZeroDefault(dict):
+    def __missing__(self, key):
+        return 0
+
+# Keep-alive pool: repeated runs of this check (or loops over it) reuse one connection
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
 
 try:
-    response = requests.get('http://localhost:8001/parameters_full', timeout=5)
-    data = response.json()
+    response = _SESSION.get('http://localhost:8001/parameters_full', timeout=5)
+    data = _ZeroDefault(_loads(response.content))  # bytes straight to the parser, no str decode
     print('Parameters endpoint working!')
     print(f'Sample parameters: P1={data.get("P1", "N/A")}, P11={data.get("P11", "N/A")}, P31={data.get("P31", "N/A")}')
     print(f'Total parameters: {len(data)}')
 
     # Check if we have the expected parameter ranges
-    p1_p10 = [data.get(f'P{i}', 0) for i in range(1, 11)]
-    p11_p20 = [data.get(f'P{i}', 0) for i in range(11, 21)]
-    p31_p40 = [data.get(f'P{i}', 0) for i in range(31, 41)]
+    p1_p10 = itemgetter(*P1_P10_KEYS)(data)
+    p11_p20 = itemgetter(*P11_P20_KEYS)(data)
+    p31_p40 = itemgetter(*P31_P40_KEYS)(data)
 
-    print(f'Network health params (P1-P10): {len([p for p in p1_p10 if p != 0])} non-zero')
-    print(f'Crowding params (P11-P20): {len([p for p in p11_p20 if p != 0])} non-zero')
-    print(f'Speed anomaly params (P31-P40): {len([p for p in p31_p40 if p != 0])} non-zero')
+    print(f'Network health params (P1-P10): {sum(p != 0 for p in p1_p10)} non-zero')
+    print(f'Crowding params (P11-P20): {sum(p != 0 for p in p11_p20)} non-zero')
+    print(f'Speed anomaly params (P31-P40): {sum(p != 0 for p in p31_p40)} non-zero')
 
 except Exception as e:
     print(f'Error: {e}')
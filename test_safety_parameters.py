@@ -3,72 +3,107 @@
 Thorough test suite for computeSafetyParameters.py integration
 """
 
+import functools
+import importlib.util
 import json
+import operator
 import time
 import sys
 from typing import Dict, List
 
-# Import the modules to test
+import pytest
+
 try:
-    from computeSafetyParameters import compute_safety_parameters
-    from compute140Parameters import compute140Parameters
-except ImportError as e:
-    print(f"Import error: {e}")
-    sys.exit(1)
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional: stdlib json
+    _loads = json.loads
+
+# The modules under test are imported on first use, not at module load: listing or collecting
+# these tests does not pay for the 140-parameter pipeline's imports
+@functools.lru_cache(maxsize=None)
+def _get_impl():
+    """(compute_safety_parameters, compute140Parameters), imported once; a failed import fails the calling test."""
+    try:
+        from computeSafetyParameters import compute_safety_parameters
+        from compute140Parameters import compute140Parameters
+    except ImportError as e:
+        pytest.fail(f"Import error: {e}")
+    return compute_safety_parameters, compute140Parameters
+
+PARAM_KEYS_121_140 = tuple(f"p{i}" for i in range(121, 141))
+_get_safety_params = operator.itemgetter(*PARAM_KEYS_121_140)
+REQUIRED_SAFETY_KEYS = frozenset(PARAM_KEYS_121_140)
+
+def in_unit_range(values) -> bool:
+    """True if every value is a number in [0, 1], NaN counting as out of range.
+    C-level sum/min/max replace a Python compare per value: a NaN anywhere makes the sum NaN."""
+    values = tuple(values)
+    if not values:
+        return True
+    try:
+        total = sum(values)
+    except TypeError:  # non-numeric value
+        return False
+    return total == total and min(values) >= 0.0 and max(values) <= 1.0
+
+def _out_of_range(items):
+    """First (key, value) failing the in_unit_range test, for the failure message."""
+    return next((k, v) for k, v in items if not isinstance(v, (int, float)) or not (0.0 <= v <= 1.0))
 
+def count_greater(a: Dict[str, float], b: Dict[str, float]) -> int:
+    """Number of p121-p140 where a's value is greater than b's: one C-level fetch per dict, compared pairwise."""
+    return sum(map(operator.gt, _get_safety_params(a), _get_safety_params(b)))
+
+@functools.lru_cache(maxsize=1)
 def load_test_data():
-    """Load test data from test_data.json"""
+    """Load test data from test_data.json (read and parsed once per process; callers must not mutate it).
+    Returns (trains, stations, edges, edge_tuples): edges as in the file, and as tuples for compute140Parameters."""
     try:
-        with open('test_data.json', 'r') as f:
-            data = json.load(f)
-        return data['trains'], data['graph']['stations'], data['graph']['edges']
+        with open('test_data.json', 'rb') as f:
+            data = _loads(f.read())
+        edges = data['graph']['edges']
+        return data['trains'], data['graph']['stations'], edges, [tuple(edge) for edge in edges]
     except Exception as e:
-        print(f"Error loading test data: {e}")
-        sys.exit(1)
+        pytest.fail(f"cannot load test_data.json: {e}")
+
+@pytest.fixture(scope="session")
+def test_data():
+    """load_test_data(), shared by every test of the session."""
+    return load_test_data()
 
-def test_basic_functionality():
+def test_basic_functionality(test_data):
     """Test basic functionality of compute_safety_parameters"""
     print("Testing basic functionality...")
+    compute_safety_parameters, _ = _get_impl()
 
-    trains, _, _ = load_test_data()
+    trains, _, _, _ = test_data
 
     # Test with basic train data
-    try:
-        safety_params = compute_safety_parameters(trains)
-        print(f"✓ Successfully computed safety parameters for {len(safety_params)} trains")
-
-        # Verify structure
-        if not isinstance(safety_params, dict):
-            print("✗ Safety parameters should be a dict")
-            return False
-
-        for train_id, params in safety_params.items():
-            if not isinstance(params, dict):
-                print(f"✗ Parameters for {train_id} should be a dict")
-                return False
-
-            # Check for required parameters p121-p140
-            for i in range(121, 141):
-                param_key = f"p{i}"
-                if param_key not in params:
-                    print(f"✗ Missing parameter {param_key} for train {train_id}")
-                    return False
-
-                value = params[param_key]
-                if not isinstance(value, (int, float)) or not (0.0 <= value <= 1.0):
-                    print(f"✗ Parameter {param_key} for train {train_id} should be float in [0,1], got {value}")
-                    return False
-
-        print("✓ All parameters present and in valid range")
-        return True
+    safety_params = compute_safety_parameters(trains)
+    print(f"✓ Successfully computed safety parameters for {len(safety_params)} trains")
 
-    except Exception as e:
-        print(f"✗ Error in basic functionality test: {e}")
-        return False
+    # Verify structure
+    assert isinstance(safety_params, dict), "Safety parameters should be a dict"
+
+    for train_id, params in safety_params.items():
+        assert isinstance(params, dict), f"Parameters for {train_id} should be a dict"
+
+        # Check for required parameters p121-p140: one set difference against the key view
+        missing = REQUIRED_SAFETY_KEYS - params.keys()
+        assert not missing, f"Missing parameters {sorted(missing)} for train {train_id}"
+
+        values = _get_safety_params(params)
+        if not in_unit_range(values):
+            param_key, value = _out_of_range(zip(PARAM_KEYS_121_140, values))
+            pytest.fail(f"Parameter {param_key} for train {train_id} should be float in [0,1], got {value}")
+
+    print("✓ All parameters present and in valid range")
 
 def test_missing_telemetry():
     """Test with missing telemetry fields"""
     print("Testing missing telemetry handling...")
+    compute_safety_parameters, _ = _get_impl()
 
     # Create train with missing fields
     test_trains = [
@@ -77,26 +112,19 @@ def test_missing_telemetry():
         {"id": "T3", "speed": 100, "driver_fatigue": 0.5, "weather_data": {"rain_mm": 10}},  # More telemetry
     ]
 
-    try:
-        safety_params = compute_safety_parameters(test_trains)
-        print(f"✓ Handled missing telemetry for {len(safety_params)} trains")
+    safety_params = compute_safety_parameters(test_trains)
+    print(f"✓ Handled missing telemetry for {len(safety_params)} trains")
 
-        # Verify deterministic behavior (same input should give same output)
-        safety_params2 = compute_safety_parameters(test_trains)
-        if safety_params != safety_params2:
-            print("✗ Non-deterministic behavior with missing telemetry")
-            return False
+    # Verify deterministic behavior (same input should give same output)
+    safety_params2 = compute_safety_parameters(test_trains)
+    assert safety_params == safety_params2, "Non-deterministic behavior with missing telemetry"
 
-        print("✓ Deterministic behavior confirmed")
-        return True
-
-    except Exception as e:
-        print(f"✗ Error in missing telemetry test: {e}")
-        return False
+    print("✓ Deterministic behavior confirmed")
 
 def test_extreme_values():
     """Test with extreme values"""
     print("Testing extreme values...")
+    compute_safety_parameters, _ = _get_impl()
 
     extreme_trains = [
         {
@@ -137,113 +165,94 @@ def test_extreme_values():
         }
     ]
 
-    try:
-        safety_params = compute_safety_parameters(extreme_trains)
-        print("✓ Handled extreme values without errors")
-
-        # Check that extreme values produce expected results
-        t1_params = safety_params["T1"]
-        t2_params = safety_params["T2"]
+    safety_params = compute_safety_parameters(extreme_trains)
+    print("✓ Handled extreme values without errors")
 
-        # T1 should have higher (worse) values than T2 for most parameters
-        worse_count = 0
-        for i in range(121, 141):
-            param = f"p{i}"
-            if t1_params[param] > t2_params[param]:
-                worse_count += 1
+    # Check that extreme values produce expected results
+    t1_params = safety_params["T1"]
+    t2_params = safety_params["T2"]
 
-        if worse_count < 15:  # Expect most parameters to be worse for T1
-            print(f"✗ Extreme values not reflected properly (only {worse_count}/20 parameters worse)")
-            return False
+    # T1 should have higher (worse) values than T2 for most parameters
+    worse_count = count_greater(t1_params, t2_params)
 
-        print("✓ Extreme values correctly reflected in parameters")
-        return True
+    # Expect most parameters to be worse for T1
+    assert worse_count >= 15, f"Extreme values not reflected properly (only {worse_count}/20 parameters worse)"
 
-    except Exception as e:
-        print(f"✗ Error in extreme values test: {e}")
-        return False
+    print("✓ Extreme values correctly reflected in parameters")
 
-def test_integration():
+def test_integration(test_data):
     """Test integration with compute140Parameters"""
     print("Testing integration with compute140Parameters...")
+    compute_safety_parameters, compute140Parameters = _get_impl()
 
-    trains, stations, edges = load_test_data()
-    # Convert edges to tuples as expected by the function
-    edges = [tuple(edge) for edge in edges]
+    # Edges as tuples, as expected by the function
+    trains, stations, _, edges = test_data
 
-    try:
-        result = compute140Parameters(trains, stations, edges)
+    result = compute140Parameters(trains, stations, edges)
 
-        if "safety_params" not in result:
-            print("✗ Safety parameters not found in compute140Parameters result")
-            return False
+    assert "safety_params" in result, "Safety parameters not found in compute140Parameters result"
 
-        safety_params = result["safety_params"]
-        print(f"✓ Safety parameters integrated, computed for {len(safety_params)} trains")
+    safety_params = result["safety_params"]
+    print(f"✓ Safety parameters integrated, computed for {len(safety_params)} trains")
 
-        # Verify structure matches standalone computation
-        standalone_safety = compute_safety_parameters(trains)
+    # Verify structure matches standalone computation
+    standalone_safety = compute_safety_parameters(trains)
 
-        if safety_params != standalone_safety:
-            print("✗ Integrated safety params differ from standalone computation")
-            return False
+    assert safety_params == standalone_safety, "Integrated safety params differ from standalone computation"
 
-        print("✓ Integration results match standalone computation")
-        return True
+    print("✓ Integration results match standalone computation")
 
-    except Exception as e:
-        print(f"✗ Error in integration test: {e}")
-        return False
+@functools.lru_cache(maxsize=4)
+def build_large_trains(n: int = 100):
+    """n synthetic trains, built once per n and shared by every caller (who must not mutate them).
+    One column per field, then rows zipped into the dicts compute_safety_parameters reads."""
+    idx = range(n)
+    columns = {
+        "id": [f"T{i}" for i in idx],
+        "speed": [i * 2 for i in idx],
+        "driver_fatigue": [(i % 10) / 10.0 for i in idx],
+        "visibility_m": [2000 - (i % 2000) for i in idx],
+        "signal_quality": [1.0 - (i % 10) / 10.0 for i in idx],
+        "spad_events": [i % 5 for i in idx],
+        "emergency_brake_count": [i % 10 for i in idx],
+        "noise_dba": [70 + (i % 30) for i in idx],
+        "vibration_rms": [(i % 20) / 10.0 for i in idx],
+        "track_curvature_risk": [(i % 10) / 10.0 for i in idx],
+    }
+    weather_columns = {
+        "rain_mm": [i % 20 for i in idx],
+        "wind_kmh": [i % 50 for i in idx],
+        "temp_c": [15 + (i % 20) for i in idx],
+        "humidity_pct": [40 + (i % 60) for i in idx],
+    }
+    return tuple(
+        dict(zip(columns, row), weather_data=dict(zip(weather_columns, weather)))
+        for row, weather in zip(zip(*columns.values()), zip(*weather_columns.values()))
+    )
 
 def test_performance():
     """Test performance with large dataset"""
     print("Testing performance...")
+    compute_safety_parameters, _ = _get_impl()
 
-    # Create larger dataset (100 trains)
-    large_trains = []
-    for i in range(100):
-        train = {
-            "id": f"T{i}",
-            "speed": i * 2,
-            "driver_fatigue": (i % 10) / 10.0,
-            "weather_data": {
-                "rain_mm": i % 20,
-                "wind_kmh": i % 50,
-                "temp_c": 15 + (i % 20),
-                "humidity_pct": 40 + (i % 60)
-            },
-            "visibility_m": 2000 - (i % 2000),
-            "signal_quality": 1.0 - (i % 10) / 10.0,
-            "spad_events": i % 5,
-            "emergency_brake_count": i % 10,
-            "noise_dba": 70 + (i % 30),
-            "vibration_rms": (i % 20) / 10.0,
-            "track_curvature_risk": (i % 10) / 10.0,
-        }
-        large_trains.append(train)
-
-    try:
-        start_time = time.time()
-        safety_params = compute_safety_parameters(large_trains)
-        end_time = time.time()
-
-        duration = end_time - start_time
-        print(f"✓ Computed safety parameters for 100 trains in {duration:.3f} seconds")
+    # Larger dataset (100 trains)
+    large_trains = build_large_trains(100)
 
-        if duration > 1.0:  # Should be fast
-            print(f"⚠ Performance warning: {duration:.3f}s for 100 trains")
-        else:
-            print("✓ Performance acceptable")
-
-        return True
+    compute_safety_parameters(large_trains[:1])  # warm-up: first-call costs stay out of the timed region
+    start_ns = time.perf_counter_ns()  # monotonic; time.time() can jump under NTP adjustments
+    compute_safety_parameters(large_trains)
+    duration = (time.perf_counter_ns() - start_ns) / 1e9
+    print(f"✓ Computed safety parameters for 100 trains in {duration:.3f} seconds")
 
-    except Exception as e:
-        print(f"✗ Error in performance test: {e}")
-        return False
+    if duration > 1.0:  # Should be fast
+        print(f"⚠ Performance warning: {duration:.3f}s for 100 trains")
+    else:
+        print("✓ Performance acceptable")
 
 def test_edge_cases():
     """Test various edge cases"""
     print("Testing edge cases...")
+    compute_safety_parameters, _ = _get_impl()
 
     edge_case_trains = [
         {"id": None},  # Invalid ID
@@ -255,34 +264,26 @@ def test_edge_cases():
         {"id": "T5", "signal_quality": 2.0},  # Values > 1.0
     ]
 
-    try:
-        safety_params = compute_safety_parameters(edge_case_trains)
-        print(f"✓ Handled edge cases, computed for {len(safety_params)} valid trains")
-
-        # Should skip invalid IDs
-        if None in safety_params or "" in safety_params:
-            print("✗ Should skip trains with invalid IDs")
-            return False
-
-        # Should handle invalid numeric values gracefully
-        for train_id in ["T1", "T2", "T3", "T4", "T5"]:
-            if train_id in safety_params:
-                params = safety_params[train_id]
-                for param_key, value in params.items():
-                    if not (0.0 <= value <= 1.0):
-                        print(f"✗ Parameter {param_key} out of range [0,1]: {value}")
-                        return False
-
-        print("✓ Edge cases handled gracefully")
-        return True
+    safety_params = compute_safety_parameters(edge_case_trains)
+    print(f"✓ Handled edge cases, computed for {len(safety_params)} valid trains")
 
-    except Exception as e:
-        print(f"✗ Error in edge cases test: {e}")
-        return False
+    # Should skip invalid IDs
+    assert None not in safety_params and "" not in safety_params, "Should skip trains with invalid IDs"
+
+    # Should handle invalid numeric values gracefully
+    for train_id in ["T1", "T2", "T3", "T4", "T5"]:
+        if train_id in safety_params:
+            params = safety_params[train_id]
+            if not in_unit_range(params.values()):
+                param_key, value = _out_of_range(params.items())
+                pytest.fail(f"Parameter {param_key} out of range [0,1]: {value}")
+
+    print("✓ Edge cases handled gracefully")
 
 def test_weather_influence():
     """Test weather influence on parameters"""
     print("Testing weather influence...")
+    compute_safety_parameters, _ = _get_impl()
 
     base_train = {
         "id": "T1",
@@ -303,60 +304,30 @@ def test_weather_influence():
         {"rain_mm": 20, "wind_kmh": 50, "temp_c": 40, "humidity_pct": 90},  # Bad weather
     ]
 
+    # compute_safety_parameters only reads its trains, so one dict serves every scenario
     results = []
     for weather in weather_scenarios:
-        test_train = base_train.copy()
-        test_train["weather_data"] = weather
-        safety_params = compute_safety_parameters([test_train])
+        base_train["weather_data"] = weather
+        safety_params = compute_safety_parameters([base_train])
         results.append(safety_params["T1"])
 
     good_weather = results[0]
     bad_weather = results[1]
 
     # Bad weather should generally have higher risk values
-    higher_risk_count = 0
-    for i in range(121, 141):
-        param = f"p{i}"
-        if bad_weather[param] > good_weather[param]:
-            higher_risk_count += 1
-
-    if higher_risk_count < 5:  # Expect some parameters to be worse in bad weather
-        print(f"✗ Weather influence not properly reflected (only {higher_risk_count}/20 parameters worse)")
-        return False
+    higher_risk_count = count_greater(bad_weather, good_weather)
+
+    # Expect some parameters to be worse in bad weather
+    assert higher_risk_count >= 5, f"Weather influence not properly reflected (only {higher_risk_count}/20 parameters worse)"
 
     print("✓ Weather conditions properly influence safety parameters")
-    return True
 
 def main():
-    """Run all tests"""
-    print("Starting thorough testing of computeSafetyParameters integration\n")
-
-    tests = [
-        test_basic_functionality,
-        test_missing_telemetry,
-        test_extreme_values,
-        test_integration,
-        test_performance,
-        test_edge_cases,
-        test_weather_influence,
-    ]
-
-    passed = 0
-    total = len(tests)
-
-    for test in tests:
-        if test():
-            passed += 1
-        print()
-
-    print(f"Test Results: {passed}/{total} tests passed")
-
-    if passed == total:
-        print("🎉 All tests passed! Safety parameters integration is working correctly.")
-        return 0
-    else:
-        print("❌ Some tests failed. Please review the issues above.")
-        return 1
+    """Run all tests through pytest (in parallel with pytest-xdist when installed)"""
+    args = [__file__, "-q"]
+    if importlib.util.find_spec("xdist") is not None:
+        args += ["-n", "auto"]
+    return int(pytest.main(args))
 
 if __name__ == "__main__":
     sys.exit(main())